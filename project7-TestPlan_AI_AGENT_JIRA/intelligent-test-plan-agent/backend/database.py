@@ -1,7 +1,8 @@
 """Database configuration and models."""
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy import Column, String, DateTime, Text, Integer, JSON
+from sqlalchemy import Column, String, DateTime, Text, Integer, JSON, event, text, inspect
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from datetime import datetime
 import os
 
@@ -9,8 +10,39 @@ import os
 os.makedirs("./data", exist_ok=True)
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./data/app.db")
+# How long a SQLite connection waits on a locked database before giving up
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "30000"))
+
+engine_options = {
+    "echo": False,
+    "poolclass": AsyncAdaptedQueuePool,
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "20")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "30")),
+    "pool_timeout": 30,
+    "pool_pre_ping": True,
+    "pool_recycle": 1800,
+}
+if DATABASE_URL.startswith("sqlite"):
+    # aiosqlite defaults to NullPool (a new connection per session); the explicit
+    # poolclass above keeps connections open. The connect timeout and the busy_timeout
+    # PRAGMA below both come from DB_BUSY_TIMEOUT_MS, so neither overrides the other.
+    engine_options["connect_args"] = {"timeout": DB_BUSY_TIMEOUT_MS / 1000}
+
+engine = create_async_engine(DATABASE_URL, **engine_options)
+
+
+if engine.dialect.name == "sqlite":
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_sqlite_pragmas(dbapi_conn, _):
+        """Use WAL so readers don't block behind the writer, and wait on locks instead of failing."""
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-20000")
+        cursor.close()
 
-engine = create_async_engine(DATABASE_URL, echo=False)
 async_session_maker = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 Base = declarative_base()
 
@@ -39,7 +71,8 @@ class HistoryModel(Base):
     ticket_id = Column(String)
     ticket_summary = Column(String)
     test_plan = Column(Text)
-    generated_at = Column(DateTime, default=datetime.utcnow)
+    test_plan_md = Column(Text)
+    generated_at = Column(DateTime, default=datetime.utcnow, index=True)
     provider_used = Column(String)
 
 
@@ -48,19 +81,32 @@ class RecentTicketModel(Base):
     
     ticket_id = Column(String, primary_key=True)
     summary = Column(String)
-    fetched_at = Column(DateTime, default=datetime.utcnow)
+    fetched_at = Column(DateTime, default=datetime.utcnow, index=True)
 
 
 async def init_db():
     """Initialize the database tables."""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        
+        # create_all() skips indexes on tables that already exist
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_recent_tickets_fetched_at ON recent_tickets (fetched_at)"
+        ))
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_history_generated_at ON history (generated_at)"
+        ))
+        
+        # Nor does it add new columns to an existing table
+        history_columns = await conn.run_sync(
+            lambda sync_conn: {c["name"] for c in inspect(sync_conn).get_columns("history")}
+        )
+        if "test_plan_md" not in history_columns:
+            await conn.execute(text("ALTER TABLE history ADD COLUMN test_plan_md TEXT"))
 
 
 async def get_db():
     """Get database session."""
+    # The context manager closes the session once the request is done
     async with async_session_maker() as session:
-        try:
-            yield session
-        finally:
-            await session.close()
+        yield session
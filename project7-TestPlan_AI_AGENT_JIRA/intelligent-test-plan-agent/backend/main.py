@@ -1,6 +1,8 @@
 """Main FastAPI application."""
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from contextlib import asynccontextmanager
 import os
 from dotenv import load_dotenv
@@ -8,9 +10,12 @@ from dotenv import load_dotenv
 # Load environment variables
 load_dotenv()
 
-from database import init_db, async_session_maker
+from database import init_db, async_session_maker, engine
 from routes import settings, jira, templates, testplan
 from routes.settings import load_settings
+from services.jira_client import close_jira_clients
+from services.llm_providers import close_llm_providers
+from services.pdf_parser import shutdown_pdf_executor
 
 
 @asynccontextmanager
@@ -18,6 +23,7 @@ async def lifespan(app: FastAPI):
     """Application lifespan handler."""
     # Startup
     await init_db()
+    app.state.sessionmaker = async_session_maker
     
     # Load settings
     async with async_session_maker() as db:
@@ -26,13 +32,17 @@ async def lifespan(app: FastAPI):
     yield
     
     # Shutdown
-    pass
+    await close_jira_clients()
+    await close_llm_providers()
+    shutdown_pdf_executor()
+    await engine.dispose()
 
 
 app = FastAPI(
     title="Intelligent Test Plan Generator API",
     description="AI-powered test plan generation from JIRA tickets",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -45,6 +55,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large test plan / template payloads; small responses are sent as-is
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # Include routers
 app.include_router(settings.router)
 app.include_router(jira.router)
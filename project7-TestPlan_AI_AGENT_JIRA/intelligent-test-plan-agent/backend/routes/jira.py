@@ -1,9 +1,10 @@
 """JIRA API routes."""
 from fastapi import APIRouter, HTTPException, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, insert, delete
+from sqlalchemy import select, delete
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from database import get_db, RecentTicketModel
-from services.jira_client import get_jira_client, JiraClient
+from services.jira_client import get_jira_client, get_issue_cached, JiraClient, ISSUE_KEY_RE
 from models import JiraIssue
 from typing import List
 from datetime import datetime
@@ -19,8 +20,7 @@ async def fetch_ticket(ticket_data: dict, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=400, detail="ticketId is required")
     
     # Validate ticket ID format
-    import re
-    if not re.match(r"^[A-Z]+-\d+$", ticket_id):
+    if not ISSUE_KEY_RE.match(ticket_id):
         raise HTTPException(status_code=400, detail="Invalid ticket ID format. Expected format: PROJECT-123")
     
     # Get JIRA client
@@ -30,28 +30,28 @@ async def fetch_ticket(ticket_data: dict, db: AsyncSession = Depends(get_db)):
     
     try:
         # Fetch issue
-        issue = await client.get_issue(ticket_id)
+        issue = await get_issue_cached(ticket_id, force_refresh=bool(ticket_data.get("forceRefresh")))
         
         # Save to recent tickets
-        result = await db.execute(
-            select(RecentTicketModel).where(RecentTicketModel.ticket_id == ticket_id)
+        stmt = sqlite_insert(RecentTicketModel).values(
+            ticket_id=ticket_id, summary=issue.summary, fetched_at=datetime.utcnow()
         )
-        existing = result.scalar_one_or_none()
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["ticket_id"],
+            set_={"fetched_at": stmt.excluded.fetched_at, "summary": stmt.excluded.summary}
+        )
+        await db.execute(stmt)
         
-        if existing:
-            existing.fetched_at = datetime.utcnow()
-        else:
-            # Keep only last 5
-            await db.execute(
-                delete(RecentTicketModel).where(
-                    RecentTicketModel.ticket_id.not_in(
-                        select(RecentTicketModel.ticket_id)
-                        .order_by(RecentTicketModel.fetched_at.desc())
-                        .limit(4)
-                    )
+        # Keep only last 5
+        await db.execute(
+            delete(RecentTicketModel).where(
+                RecentTicketModel.ticket_id.in_(
+                    select(RecentTicketModel.ticket_id)
+                    .order_by(RecentTicketModel.fetched_at.desc())
+                    .offset(5)
                 )
             )
-            db.add(RecentTicketModel(ticket_id=ticket_id, summary=issue.summary))
+        )
         
         await db.commit()
         
@@ -76,6 +76,3 @@ async def get_recent_tickets(db: AsyncSession = Depends(get_db)):
             for t in tickets
         ]
     }
-
-
-from sqlalchemy import delete
@@ -4,20 +4,31 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, delete
 from database import get_db, SettingsModel
 from models import JiraConfig, LLMConfig, LLMProvider
-from services.jira_client import JiraClient, set_jira_client
-from services.llm_providers import get_llm_provider, GroqProvider, OllamaProvider
-import json
+from services.jira_client import JiraClient, get_jira_client, set_jira_client
+from services.llm_providers import create_llm_provider, GroqProvider, OllamaProvider
+from typing import Optional
+import orjson
 import os
+import time
 
 router = APIRouter(prefix="/api/settings", tags=["settings"])
 
+# Last connection test per (base_url, username): {key: (expires_at, payload)}
+_jira_status_cache: dict = {}
+JIRA_STATUS_TTL = 30
+JIRA_STATUS_ERROR_TTL = 5
+
+# Parsed LLM config; the version guards against caching a load that raced a save
+_llm_config_cache: Optional[LLMConfig] = None
+_llm_config_version = 0
+
 
 @router.post("/jira")
 async def save_jira_config(config: JiraConfig, db: AsyncSession = Depends(get_db)):
     """Save JIRA configuration."""
+    client = JiraClient(config.base_url, config.username, config.api_token)
     try:
         # Test connection first
-        client = JiraClient(config.base_url, config.username, config.api_token)
         await client.test_connection()
         
         # Save to database (encrypted)
@@ -32,17 +43,21 @@ async def save_jira_config(config: JiraConfig, db: AsyncSession = Depends(get_db
         existing = result.scalar_one_or_none()
         
         if existing:
-            existing.value = json.dumps(settings)
+            existing.value = orjson.dumps(settings).decode()
         else:
-            db.add(SettingsModel(key="jira_config", value=json.dumps(settings)))
+            db.add(SettingsModel(key="jira_config", value=orjson.dumps(settings).decode()))
         
         await db.commit()
         
-        # Set global client
+        # Set global client, keeping the connection we just tested; the old one
+        # is closed after a grace period so in-flight requests can finish
         set_jira_client(client)
+        _jira_status_cache.clear()
         
         return {"status": "success", "message": "JIRA configuration saved"}
     except Exception as e:
+        if get_jira_client() is not client:
+            await client.close()
         raise HTTPException(status_code=400, detail=f"Failed to save JIRA config: {str(e)}")
 
 
@@ -56,19 +71,46 @@ async def get_jira_status(db: AsyncSession = Depends(get_db)):
         if not config:
             return {"configured": False, "message": "JIRA not configured"}
         
-        # Test connection
-        settings = json.loads(config.value)
-        client = JiraClient(settings["base_url"], settings["username"], settings["api_token"])
+        settings = orjson.loads(config.value)
+        cache_key = (settings["base_url"], settings["username"])
+    except Exception as e:
+        return {"configured": True, "connected": False, "error": str(e)}
+    
+    cached = _jira_status_cache.get(cache_key)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    
+    # Test connection, reusing the live client when it matches the saved config
+    client = get_jira_client()
+    ad_hoc_client = None
+    try:
+        if not client or not client.matches(settings["base_url"], settings["username"]):
+            client = ad_hoc_client = JiraClient(settings["base_url"], settings["username"], settings["api_token"])
         user_info = await client.test_connection()
         
-        return {
+        status = {
             "configured": True,
             "connected": True,
             "user": user_info.get("displayName"),
             "base_url": settings["base_url"]
         }
+        ttl = JIRA_STATUS_TTL
     except Exception as e:
-        return {"configured": True, "connected": False, "error": str(e)}
+        status = {"configured": True, "connected": False, "error": str(e)}
+        ttl = JIRA_STATUS_ERROR_TTL
+    finally:
+        if ad_hoc_client:
+            await ad_hoc_client.close()
+    
+    _jira_status_cache[cache_key] = (time.monotonic() + ttl, status)
+    return status
+
+
+@router.delete("/jira/cache")
+async def clear_jira_status_cache():
+    """Drop cached JIRA connection status so the next check hits JIRA."""
+    _jira_status_cache.clear()
+    return {"status": "success", "message": "JIRA status cache cleared"}
 
 
 @router.post("/llm")
@@ -89,12 +131,16 @@ async def save_llm_config(config: LLMConfig, db: AsyncSession = Depends(get_db))
         existing = result.scalar_one_or_none()
         
         if existing:
-            existing.value = json.dumps(settings)
+            existing.value = orjson.dumps(settings).decode()
         else:
-            db.add(SettingsModel(key="llm_config", value=json.dumps(settings)))
+            db.add(SettingsModel(key="llm_config", value=orjson.dumps(settings).decode()))
         
         await db.commit()
         
+        global _llm_config_cache, _llm_config_version
+        _llm_config_cache = config
+        _llm_config_version += 1
+        
         return {"status": "success", "message": "LLM configuration saved"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to save LLM config: {str(e)}")
@@ -110,7 +156,7 @@ async def get_llm_status(db: AsyncSession = Depends(get_db)):
         if not config:
             return {"configured": False, "message": "LLM not configured"}
         
-        settings = json.loads(config.value)
+        settings = orjson.loads(config.value)
         return {
             "configured": True,
             "provider": settings.get("provider"),
@@ -126,8 +172,9 @@ async def get_llm_status(db: AsyncSession = Depends(get_db)):
 async def test_llm_connection(config: LLMConfig):
     """Test LLM provider connection."""
     try:
-        provider = get_llm_provider(config)
-        success = await provider.test_connection()
+        # A throwaway provider, so probing unsaved configs doesn't churn the shared cache
+        async with create_llm_provider(config) as provider:
+            success = await provider.test_connection()
         
         if success:
             return {"status": "success", "message": f"{config.provider.value} connection successful"}
@@ -141,13 +188,31 @@ async def test_llm_connection(config: LLMConfig):
 async def list_ollama_models(base_url: str = "http://localhost:11434"):
     """List available Ollama models."""
     try:
-        provider = OllamaProvider(base_url=base_url)
-        models = await provider.list_models()
+        async with OllamaProvider(base_url=base_url) as provider:
+            models = await provider.list_models()
         return {"models": models}
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"Failed to fetch Ollama models: {str(e)}")
 
 
+async def get_current_llm_config(db: AsyncSession) -> Optional[LLMConfig]:
+    """Get the saved LLM configuration, loading it from the database on first use."""
+    global _llm_config_cache
+    if _llm_config_cache is not None:
+        return _llm_config_cache
+    
+    version = _llm_config_version
+    result = await db.execute(select(SettingsModel).where(SettingsModel.key == "llm_config"))
+    llm_settings = result.scalar_one_or_none()
+    if not llm_settings:
+        return None
+    
+    config = LLMConfig(**orjson.loads(llm_settings.value))
+    if version == _llm_config_version:
+        _llm_config_cache = config
+    return config
+
+
 async def load_settings(db: AsyncSession):
     """Load settings on startup."""
     # Load JIRA config
@@ -155,6 +220,6 @@ async def load_settings(db: AsyncSession):
     jira_config = result.scalar_one_or_none()
     
     if jira_config:
-        settings = json.loads(jira_config.value)
+        settings = orjson.loads(jira_config.value)
         client = JiraClient(settings["base_url"], settings["username"], settings["api_token"])
         set_jira_client(client)
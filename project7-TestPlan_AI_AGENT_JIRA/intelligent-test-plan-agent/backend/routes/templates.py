@@ -1,17 +1,21 @@
 """Template API routes."""
 from fastapi import APIRouter, HTTPException, UploadFile, File, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, delete, func
 from database import get_db, TemplateModel
 from services.pdf_parser import parse_template
 from models import TemplateInfo
 from typing import List
 from datetime import datetime
+import asyncio
 import uuid
 import os
 
 router = APIRouter(prefix="/api/templates", tags=["templates"])
 
+MAX_TEMPLATE_SIZE = 5 * 1024 * 1024
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
 
 @router.post("/upload")
 async def upload_template(
@@ -23,14 +27,24 @@ async def upload_template(
     if not file.filename.endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are allowed")
     
-    # Check file size (5MB limit)
-    content = await file.read()
-    if len(content) > 5 * 1024 * 1024:
-        raise HTTPException(status_code=400, detail="File size exceeds 5MB limit")
+    # Check file size (5MB limit) before reading, then again while reading
+    declared_size = file.size or int(file.headers.get("content-length") or 0)
+    if declared_size > MAX_TEMPLATE_SIZE:
+        raise HTTPException(status_code=413, detail="File size exceeds 5MB limit")
+    
+    buffer = bytearray()
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer.extend(chunk)
+        if len(buffer) > MAX_TEMPLATE_SIZE:
+            raise HTTPException(status_code=413, detail="File size exceeds 5MB limit")
+    content = bytes(buffer)
     
     try:
-        # Parse PDF
-        template_content = parse_template(content)
+        # Parse PDF off the event loop; extraction is CPU-bound
+        template_content = await asyncio.to_thread(parse_template, content)
         
         # Save to database
         template_id = str(uuid.uuid4())
@@ -54,18 +68,25 @@ async def upload_template(
 @router.get("/")
 async def list_templates(db: AsyncSession = Depends(get_db)):
     """List all uploaded templates."""
-    result = await db.execute(select(TemplateModel).order_by(TemplateModel.uploaded_at.desc()))
-    templates = result.scalars().all()
+    # Let SQLite truncate the content; one extra char tells us whether to add "..."
+    result = await db.execute(
+        select(
+            TemplateModel.id,
+            TemplateModel.name,
+            TemplateModel.uploaded_at,
+            func.substr(TemplateModel.content, 1, 201).label("preview")
+        ).order_by(TemplateModel.uploaded_at.desc())
+    )
     
     return {
         "templates": [
             {
-                "id": t.id,
-                "name": t.name,
-                "uploaded_at": t.uploaded_at,
-                "preview": t.content[:200] + "..." if len(t.content) > 200 else t.content
+                "id": template_id,
+                "name": name,
+                "uploaded_at": uploaded_at,
+                "preview": preview[:200] + "..." if len(preview) > 200 else preview
             }
-            for t in templates
+            for template_id, name, uploaded_at, preview in result.all()
         ]
     }
 
@@ -93,14 +114,14 @@ async def get_template(template_id: str, db: AsyncSession = Depends(get_db)):
 async def delete_template(template_id: str, db: AsyncSession = Depends(get_db)):
     """Delete a template."""
     result = await db.execute(
-        select(TemplateModel).where(TemplateModel.id == template_id)
+        delete(TemplateModel)
+        .where(TemplateModel.id == template_id)
+        .returning(TemplateModel.id)
     )
-    template = result.scalar_one_or_none()
     
-    if not template:
+    if result.scalar_one_or_none() is None:
         raise HTTPException(status_code=404, detail="Template not found")
     
-    await db.delete(template)
     await db.commit()
     
     return {"status": "success", "message": "Template deleted"}
@@ -1,15 +1,18 @@
 """Test Plan generation API routes."""
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from database import get_db, HistoryModel, TemplateModel
-from services.jira_client import get_jira_client
+from services.jira_client import get_jira_client, get_issue_cached
 from services.llm_providers import get_llm_provider
+from routes.settings import get_current_llm_config
 from models import GenerateRequest, LLMConfig, LLMProvider, ExportFormat
-from typing import Optional
+from typing import Optional, Tuple
 from datetime import datetime
+import asyncio
 import uuid
-import json
+import orjson
 import markdown
 
 router = APIRouter(prefix="/api/testplan", tags=["testplan"])
@@ -27,100 +30,117 @@ async def generate_test_plan(
     if not jira_client:
         raise HTTPException(status_code=400, detail="JIRA not configured")
     
-    # Fetch ticket
-    try:
-        issue = await jira_client.get_issue(request.ticket_id)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Failed to fetch ticket: {str(e)}")
-    
-    # Get template content if specified
-    template_content = None
-    if request.template_id:
-        result = await db.execute(
-            select(TemplateModel).where(TemplateModel.id == request.template_id)
-        )
-        template = result.scalar_one_or_none()
-        if template:
-            template_content = template.content
-    
-    # Get LLM config
-    result = await db.execute(select(HistoryModel).limit(1))  # Dummy query
-    
-    # Load LLM settings
-    from database import SettingsModel
-    result = await db.execute(
-        select(SettingsModel).where(SettingsModel.key == "llm_config")
+    # Fetch ticket while the template and LLM config load from the database
+    issue, db_inputs = await asyncio.gather(
+        get_issue_cached(request.ticket_id),
+        _load_generation_inputs(db, request.template_id),
+        return_exceptions=True
     )
-    llm_settings = result.scalar_one_or_none()
+    if isinstance(issue, Exception):
+        raise HTTPException(status_code=400, detail=f"Failed to fetch ticket: {str(issue)}")
+    if isinstance(db_inputs, Exception):
+        raise db_inputs
+    template_content, llm_config = db_inputs
     
-    if not llm_settings:
+    if not llm_config:
         raise HTTPException(status_code=400, detail="LLM not configured")
     
-    settings = json.loads(llm_settings.value)
-    
     # Override provider if specified
     provider_type = request.provider
-    
-    config = LLMConfig(
-        provider=provider_type,
-        groq_api_key=settings.get("groq_api_key"),
-        groq_model=settings.get("groq_model"),
-        ollama_base_url=settings.get("ollama_base_url"),
-        ollama_model=settings.get("ollama_model"),
-        temperature=settings.get("temperature", 0.7)
-    )
+    config = llm_config.model_copy(update={"provider": provider_type})
     
     # Generate test plan
     try:
-        provider = get_llm_provider(config)
-        comprehensive_plan = await provider.generate_test_plan(
-            issue, 
-            template_content,
-            comprehensive=request.comprehensive
-        )
+        async with get_llm_provider(config) as provider:
+            comprehensive_plan = await provider.generate_test_plan(
+                issue, 
+                template_content,
+                comprehensive=request.comprehensive
+            )
         
         # Save to history
         history_id = str(uuid.uuid4())
-        # Convert to dict and handle datetime serialization
-        test_plan_dict = comprehensive_plan.dict()
-        test_plan_dict["generated_at"] = test_plan_dict["generated_at"].isoformat()
+        # JSON mode renders generated_at as ISO 8601, matching what export reads back
+        test_plan_dict = comprehensive_plan.model_dump(mode="json")
+        test_plan_json = orjson.dumps(test_plan_dict)
         db.add(HistoryModel(
             id=history_id,
             ticket_id=issue.key,
             ticket_summary=issue.summary,
-            test_plan=json.dumps(test_plan_dict),
+            test_plan=test_plan_json.decode(),
+            test_plan_md=_convert_to_markdown(test_plan_dict),
             provider_used=provider_type.value
         ))
         await db.commit()
         
-        return {
+        # Embed the already-serialized plan rather than having FastAPI encode the dict again
+        return ORJSONResponse({
             "status": "success",
-            "test_plan": test_plan_dict,
+            "test_plan": orjson.Fragment(test_plan_json),
             "history_id": history_id
-        }
+        })
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate test plan: {str(e)}")
 
 
+async def _load_generation_inputs(
+    db: AsyncSession,
+    template_id: Optional[str]
+) -> Tuple[Optional[str], Optional[LLMConfig]]:
+    """Load template content (if requested) and the LLM config.
+    
+    Both queries share one session, which can't run statements concurrently,
+    so they run in sequence here while the JIRA fetch runs alongside.
+    """
+    template_content = None
+    if template_id:
+        result = await db.execute(
+            select(TemplateModel.content).where(TemplateModel.id == template_id)
+        )
+        template_content = result.scalar_one_or_none()
+    
+    llm_config = await get_current_llm_config(db)
+    return template_content, llm_config
+
+
 @router.get("/history")
-async def get_history(db: AsyncSession = Depends(get_db)):
-    """Get generation history."""
-    result = await db.execute(
-        select(HistoryModel).order_by(HistoryModel.generated_at.desc()).limit(50)
-    )
-    history = result.scalars().all()
+async def get_history(
+    db: AsyncSession = Depends(get_db),
+    limit: int = 50,
+    before: Optional[datetime] = None
+):
+    """Get generation history, newest first, a page at a time.
+    
+    Pass the returned next_cursor as `before` to fetch the next page.
+    """
+    limit = max(1, min(limit, 100))
+    
+    # Metadata columns only; test_plan and test_plan_md can be large
+    query = select(
+        HistoryModel.id,
+        HistoryModel.ticket_id,
+        HistoryModel.ticket_summary,
+        HistoryModel.generated_at,
+        HistoryModel.provider_used
+    ).order_by(HistoryModel.generated_at.desc()).limit(limit)
+    if before:
+        query = query.where(HistoryModel.generated_at < before)
+    
+    rows = (await db.execute(query)).all()
+    last_generated_at = rows[-1].generated_at if rows else None
     
     return {
         "history": [
             {
-                "id": h.id,
-                "ticket_id": h.ticket_id,
-                "ticket_summary": h.ticket_summary,
-                "generated_at": h.generated_at.isoformat() if h.generated_at else None,
-                "provider_used": h.provider_used
+                "id": history_id,
+                "ticket_id": ticket_id,
+                "ticket_summary": ticket_summary,
+                "generated_at": generated_at.isoformat() if generated_at else None,
+                "provider_used": provider_used
             }
-            for h in history
-        ]
+            for history_id, ticket_id, ticket_summary, generated_at, provider_used in rows
+        ],
+        "next_cursor": last_generated_at.isoformat() if len(rows) == limit and last_generated_at else None
     }
 
 
@@ -135,14 +155,15 @@ async def get_history_item(history_id: str, db: AsyncSession = Depends(get_db)):
     if not item:
         raise HTTPException(status_code=404, detail="History item not found")
     
-    return {
+    # The stored plan is already JSON; pass it through without parsing it
+    return ORJSONResponse({
         "id": item.id,
         "ticket_id": item.ticket_id,
         "ticket_summary": item.ticket_summary,
-        "test_plan": json.loads(item.test_plan),
+        "test_plan": orjson.Fragment(item.test_plan),
         "generated_at": item.generated_at.isoformat() if item.generated_at else None,
         "provider_used": item.provider_used
-    }
+    })
 
 
 @router.post("/export/{history_id}")
@@ -163,14 +184,18 @@ async def export_test_plan(
     if not item:
         raise HTTPException(status_code=404, detail="History item not found")
     
-    test_plan = json.loads(item.test_plan)
+    if format_type == "markdown" and item.test_plan_md is not None:
+        return {"content": item.test_plan_md, "format": "markdown", "filename": f"{item.ticket_id}_test_plan.md"}
+    
+    test_plan = orjson.loads(item.test_plan)
     
     if format_type == "markdown":
+        # Rows saved before test_plan_md existed
         content = _convert_to_markdown(test_plan)
         return {"content": content, "format": "markdown", "filename": f"{test_plan['source_issue']}_test_plan.md"}
     
     elif format_type == "json":
-        return {"content": json.dumps(test_plan, indent=2), "format": "json", "filename": f"{test_plan['source_issue']}_test_plan.json"}
+        return {"content": orjson.dumps(test_plan, option=orjson.OPT_INDENT_2).decode(), "format": "json", "filename": f"{test_plan['source_issue']}_test_plan.json"}
     
     else:
         raise HTTPException(status_code=400, detail=f"Unsupported format: {format_type}")
@@ -178,124 +203,124 @@ async def export_test_plan(
 
 def _convert_to_markdown(test_plan: dict) -> str:
     """Convert comprehensive test plan to markdown format."""
-    md = f"# {test_plan['title']}\n\n"
-    md += f"**Source:** {test_plan['source_issue']}\n\n"
     generated_at = test_plan.get('generated_at', 'N/A')
-    md += f"**Generated:** {generated_at}\n\n"
-    md += f"**Total Test Cases:** {test_plan['metadata'].get('total_tests', 0)}\n\n"
+    parts = [
+        f"# {test_plan['title']}\n\n",
+        f"**Source:** {test_plan['source_issue']}\n\n",
+        f"**Generated:** {generated_at}\n\n",
+        f"**Total Test Cases:** {test_plan['metadata'].get('total_tests', 0)}\n\n",
+    ]
     
     # Check if it's a comprehensive test plan
     is_comprehensive = test_plan.get('executive_summary') is not None
     
     if is_comprehensive:
-        md += "---\n\n"
-        
-        # Executive Summary
-        md += "## Executive Summary\n\n"
-        md += f"{test_plan.get('executive_summary', 'N/A')}\n\n"
-        
-        # Scope & Objectives
-        md += "## Scope & Objectives\n\n"
-        md += f"{test_plan.get('scope_objectives', 'N/A')}\n\n"
-        
-        # Test Strategy
-        md += "## Test Strategy\n\n"
-        md += f"{test_plan.get('test_strategy', 'N/A')}\n\n"
-        
-        # Test Environment
-        md += "## Test Environment\n\n"
-        md += f"{test_plan.get('test_environment', 'N/A')}\n\n"
+        parts.extend([
+            "---\n\n",
+            # Executive Summary
+            "## Executive Summary\n\n",
+            f"{test_plan.get('executive_summary', 'N/A')}\n\n",
+            # Scope & Objectives
+            "## Scope & Objectives\n\n",
+            f"{test_plan.get('scope_objectives', 'N/A')}\n\n",
+            # Test Strategy
+            "## Test Strategy\n\n",
+            f"{test_plan.get('test_strategy', 'N/A')}\n\n",
+            # Test Environment
+            "## Test Environment\n\n",
+            f"{test_plan.get('test_environment', 'N/A')}\n\n",
+        ])
         
         # Entry Criteria
-        md += "## Entry Criteria\n\n"
+        parts.append("## Entry Criteria\n\n")
         entry_criteria = test_plan.get('entry_criteria', [])
         if entry_criteria:
-            for criteria in entry_criteria:
-                md += f"- {criteria}\n"
+            parts.extend(f"- {criteria}\n" for criteria in entry_criteria)
         else:
-            md += "- No specific entry criteria defined\n"
-        md += "\n"
+            parts.append("- No specific entry criteria defined\n")
+        parts.append("\n")
         
         # Exit Criteria
-        md += "## Exit Criteria\n\n"
+        parts.append("## Exit Criteria\n\n")
         exit_criteria = test_plan.get('exit_criteria', [])
         if exit_criteria:
-            for criteria in exit_criteria:
-                md += f"- {criteria}\n"
+            parts.extend(f"- {criteria}\n" for criteria in exit_criteria)
         else:
-            md += "- No specific exit criteria defined\n"
-        md += "\n"
+            parts.append("- No specific exit criteria defined\n")
+        parts.append("\n")
         
         # Risks & Mitigations
-        md += "## Risks & Mitigations\n\n"
+        parts.append("## Risks & Mitigations\n\n")
         risks = test_plan.get('risks_mitigations', [])
         if risks:
-            md += "| Risk | Impact | Mitigation |\n"
-            md += "|------|--------|------------|\n"
-            for risk in risks:
-                md += f"| {risk.get('description', 'N/A')} | {risk.get('impact', 'N/A')} | {risk.get('mitigation', 'N/A')} |\n"
+            parts.append("| Risk | Impact | Mitigation |\n")
+            parts.append("|------|--------|------------|\n")
+            parts.extend(
+                f"| {risk.get('description', 'N/A')} | {risk.get('impact', 'N/A')} | {risk.get('mitigation', 'N/A')} |\n"
+                for risk in risks
+            )
         else:
-            md += "No risks identified\n"
-        md += "\n"
+            parts.append("No risks identified\n")
+        parts.append("\n")
         
         # Test Schedule
-        md += "## Test Schedule\n\n"
+        parts.append("## Test Schedule\n\n")
         schedule = test_plan.get('test_schedule', [])
         if schedule:
             for phase in schedule:
-                md += f"### {phase.get('phase', 'Phase')}\n\n"
-                md += f"**Duration:** {phase.get('duration', 'N/A')}\n\n"
+                parts.append(f"### {phase.get('phase', 'Phase')}\n\n")
+                parts.append(f"**Duration:** {phase.get('duration', 'N/A')}\n\n")
                 activities = phase.get('activities', [])
                 if activities:
-                    md += "**Activities:**\n"
-                    for activity in activities:
-                        md += f"- {activity}\n"
-                md += "\n"
+                    parts.append("**Activities:**\n")
+                    parts.extend(f"- {activity}\n" for activity in activities)
+                parts.append("\n")
         else:
-            md += "No schedule defined\n\n"
+            parts.append("No schedule defined\n\n")
         
         # Resource Requirements
-        md += "## Resource Requirements\n\n"
+        parts.append("## Resource Requirements\n\n")
         resources = test_plan.get('resource_requirements', [])
         if resources:
-            md += "| Type | Description | Quantity |\n"
-            md += "|------|-------------|----------|\n"
-            for resource in resources:
-                md += f"| {resource.get('type', 'N/A')} | {resource.get('description', 'N/A')} | {resource.get('quantity', 'N/A')} |\n"
+            parts.append("| Type | Description | Quantity |\n")
+            parts.append("|------|-------------|----------|\n")
+            parts.extend(
+                f"| {resource.get('type', 'N/A')} | {resource.get('description', 'N/A')} | {resource.get('quantity', 'N/A')} |\n"
+                for resource in resources
+            )
         else:
-            md += "No resources defined\n"
-        md += "\n"
+            parts.append("No resources defined\n")
+        parts.append("\n")
         
         # Test Cases Section
-        md += "---\n\n"
-        md += "# Test Cases\n\n"
+        parts.append("---\n\n")
+        parts.append("# Test Cases\n\n")
     else:
-        md += "---\n\n"
+        parts.append("---\n\n")
     
     # Test Cases
     for tc in test_plan.get('test_cases', []):
-        md += f"## {tc['id']}: {tc['title']}\n\n"
-        md += f"**Type:** {tc['test_type']} | **Priority:** {tc['priority']}\n\n"
-        md += f"**Description:** {tc['description']}\n\n"
+        parts.extend([
+            f"## {tc['id']}: {tc['title']}\n\n",
+            f"**Type:** {tc['test_type']} | **Priority:** {tc['priority']}\n\n",
+            f"**Description:** {tc['description']}\n\n",
+        ])
         
         if tc.get('preconditions'):
-            md += "### Preconditions\n"
-            for pre in tc['preconditions']:
-                md += f"- {pre}\n"
-            md += "\n"
+            parts.append("### Preconditions\n")
+            parts.extend(f"- {pre}\n" for pre in tc['preconditions'])
+            parts.append("\n")
         
         if tc.get('steps'):
-            md += "### Steps\n"
-            for i, step in enumerate(tc['steps'], 1):
-                md += f"{i}. {step}\n"
-            md += "\n"
+            parts.append("### Steps\n")
+            parts.extend(f"{i}. {step}\n" for i, step in enumerate(tc['steps'], 1))
+            parts.append("\n")
         
         if tc.get('expected_results'):
-            md += "### Expected Results\n"
-            for er in tc['expected_results']:
-                md += f"- {er}\n"
-            md += "\n"
+            parts.append("### Expected Results\n")
+            parts.extend(f"- {er}\n" for er in tc['expected_results'])
+            parts.append("\n")
         
-        md += "---\n\n"
+        parts.append("---\n\n")
     
-    return md
+    return "".join(parts)
@@ -1,10 +1,78 @@
 """JIRA API client service."""
+import asyncio
 import httpx
 import json
 import re
-from typing import Optional, Dict, Any
+import time
+from itertools import islice
+from typing import Optional, Dict, Any, List, Tuple, Union
+from cachetools import LRUCache
 from models import JiraIssue
 
+try:
+    # Optional: lets large issue payloads be parsed while they download
+    import ijson
+except ImportError:
+    ijson = None
+
+ISSUE_FIELDS = "summary,description,issuetype,priority,status,assignee,labels,components,attachment"
+# Seconds a cached issue is trusted before revalidating against its "updated" field
+ISSUE_CACHE_TTL = 60
+# Well-formed issue keys, e.g. "PROJ-123" or "MY_PROJ2-7" (project keys may contain digits and
+# underscores after the first letter); \Z rather than $ so a trailing newline doesn't pass
+ISSUE_KEY_RE = re.compile(r"^[A-Z][A-Z0-9_]*-\d+\Z")
+# Keys per JQL search request (JIRA Cloud's maxResults ceiling)
+SEARCH_BATCH_SIZE = 100
+# Issue responses at least this large are stream-parsed (when ijson is installed)
+STREAM_PARSE_THRESHOLD = 32 * 1024
+# ijson prefixes of ADF text nodes inside the description
+_ADF_TEXT_PREFIX = re.compile(r"fields\.description(?:\.content\.item)*\.text")
+# Upper bound on in-flight JIRA requests across all clients
+_JIRA_SEM = asyncio.Semaphore(16)
+
+# Common patterns for acceptance criteria: labelled sections first, then Given/When/Then
+# steps. The step pattern runs without DOTALL so each match stops at the end of its line.
+_AC_SECTION_RE = re.compile(r"(?:Acceptance Criteria|AC|Scenario):\s*(.+?)(?=\n\n|\Z)", re.IGNORECASE | re.DOTALL)
+_AC_STEP_RE = re.compile(r"(?:Given|When|Then).*", re.IGNORECASE)
+# Most Given/When/Then steps kept when there is no labelled section
+AC_MAX_STEPS = 20
+# ADF headings that introduce an acceptance criteria section
+_AC_HEADING_RE = re.compile(r"(?:Acceptance Criteria|AC|Scenarios?)\s*:?", re.IGNORECASE)
+
+
+def _adf_texts(node: Any) -> List[str]:
+    """Collect the text nodes under an ADF node, in document order."""
+    # Iterative depth-first walk; children go on the stack reversed to keep document order
+    texts = []
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if node.get("type") == "text":
+                texts.append(node.get("text", ""))
+            else:
+                children = node.get("content")
+                if children:
+                    stack.extend(reversed(children))
+        elif isinstance(node, list):
+            stack.extend(reversed(node))
+    return texts
+
+
+def _adf_block(block_type: Optional[str], texts: List[str], level: Optional[int] = None) -> Dict[str, Any]:
+    """Build a minimal ADF block that yields the same text (and heading level) as the original."""
+    if block_type == "text":
+        return {"type": "text", "text": " ".join(texts)}
+    block = {"type": block_type, "content": [{"type": "text", "text": " ".join(texts)}] if texts else []}
+    if level is not None:
+        block["attrs"] = {"level": level}
+    return block
+
+
+def _heading_level(block: Dict[str, Any]) -> int:
+    """Get an ADF heading's level, treating a missing one as a top-level heading."""
+    return (block.get("attrs") or {}).get("level") or 1
+
 
 class JiraClient:
     def __init__(self, base_url: str, username: str, api_token: str):
@@ -14,109 +82,309 @@ class JiraClient:
             "Accept": "application/json",
             "Content-Type": "application/json"
         }
+        # One pooled client per JiraClient so keep-alive and TLS sessions are reused;
+        # HTTP/2 multiplexes concurrent issue fetches over a single connection
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            auth=self.auth,
+            headers=self.headers,
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            timeout=30.0
+        )
+        # issue key -> (cached_at, JIRA "updated" timestamp, parsed issue)
+        self._issue_cache: LRUCache = LRUCache(maxsize=256)
+    
+    async def __aenter__(self) -> "JiraClient":
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
+    
+    def matches(self, base_url: str, username: str) -> bool:
+        """Check whether this client talks to the given JIRA site as the given user."""
+        return self.base_url == base_url.rstrip("/") and self.auth[0] == username
+    
+    async def close(self):
+        """Close the underlying HTTP connection pool."""
+        await self._client.aclose()
     
     async def test_connection(self) -> Dict[str, Any]:
         """Test JIRA connection by fetching current user info."""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/rest/api/3/myself",
-                auth=self.auth,
-                headers=self.headers
-            )
-            response.raise_for_status()
-            return response.json()
-    
-    async def get_issue(self, issue_key: str) -> JiraIssue:
-        """Fetch a JIRA issue by key."""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(
-                f"{self.base_url}/rest/api/3/issue/{issue_key}",
-                auth=self.auth,
-                headers=self.headers,
-                params={"fields": "summary,description,issuetype,priority,status,assignee,labels,components,attachment"}
+        async with _JIRA_SEM:
+            response = await self._client.get("/rest/api/3/myself")
+        response.raise_for_status()
+        return response.json()
+    
+    async def get_issue(self, issue_key: str, use_cache: bool = True) -> JiraIssue:
+        """Fetch a JIRA issue by key.
+        
+        Parsed issues are cached per key. Within ISSUE_CACHE_TTL the cached copy is
+        returned as-is; after that a fields=updated request checks whether the issue
+        changed before paying for a full fetch and re-parse.
+        """
+        cached = self._issue_cache.get(issue_key) if use_cache else None
+        if cached:
+            cached_at, updated, issue = cached
+            if time.monotonic() - cached_at < ISSUE_CACHE_TTL:
+                return issue.model_copy(deep=True)
+            if updated and await self._get_issue_updated(issue_key) == updated:
+                self._issue_cache[issue_key] = (time.monotonic(), updated, issue)
+                return issue.model_copy(deep=True)
+        
+        async with _JIRA_SEM:
+            async with self._client.stream(
+                "GET",
+                f"/rest/api/3/issue/{issue_key}",
+                params={"fields": f"{ISSUE_FIELDS},updated"}
+            ) as response:
+                response.raise_for_status()
+                content_length = int(response.headers.get("Content-Length") or 0)
+                if ijson is None or 0 < content_length < STREAM_PARSE_THRESHOLD:
+                    data = json.loads(await response.aread())
+                else:
+                    data = await self._stream_parse_issue(response)
+        
+        issue = self._parse_issue(data)
+        updated = data.get("fields", {}).get("updated")
+        self._issue_cache[issue_key] = (time.monotonic(), updated, issue)
+        return issue.model_copy(deep=True)
+    
+    async def _stream_parse_issue(self, response: httpx.Response) -> Dict[str, Any]:
+        """Parse an issue response as it downloads, without building the description's full ADF tree.
+        
+        The description is reduced to its top-level blocks, each holding only its type, heading
+        level and joined text, which is all _extract_description() needs; other fields are built as usual.
+        """
+        builder = ijson.ObjectBuilder()
+        description = None
+        blocks = []
+        block_type = None
+        block_level = None
+        block_texts = []
+        
+        def consume(events):
+            nonlocal description, block_type, block_level, block_texts
+            for prefix, event, value in events:
+                if prefix == "fields" and event == "map_key" and value == "description":
+                    continue
+                if prefix == "fields.description" or prefix.startswith("fields.description."):
+                    if prefix == "fields.description.content.item":
+                        if event == "start_map":
+                            block_type, block_level, block_texts = None, None, []
+                        elif event == "end_map":
+                            blocks.append(_adf_block(block_type, block_texts, block_level))
+                    elif prefix == "fields.description.content.item.attrs.level" and event == "number":
+                        block_level = int(value)
+                    elif event == "string":
+                        if prefix == "fields.description":
+                            description = value
+                        elif prefix == "fields.description.content.item.type":
+                            block_type = value
+                        elif prefix == "fields.description.text":
+                            blocks.append(_adf_block("text", [value]))
+                        elif _ADF_TEXT_PREFIX.fullmatch(prefix):
+                            block_texts.append(value)
+                    continue
+                builder.event(event, value)
+            events.clear()
+        
+        events = ijson.sendable_list()
+        parser = ijson.parse_coro(events, use_float=True)
+        async for chunk in response.aiter_bytes():
+            parser.send(chunk)
+            consume(events)
+        parser.close()
+        consume(events)
+        
+        data = builder.value
+        fields = data.get("fields")
+        if isinstance(fields, dict):
+            fields["description"] = description if description is not None else {"type": "doc", "content": blocks}
+        return data
+    
+    async def _get_issue_updated(self, issue_key: str) -> Optional[str]:
+        """Fetch only the issue's last-updated timestamp."""
+        async with _JIRA_SEM:
+            response = await self._client.get(
+                f"/rest/api/3/issue/{issue_key}",
+                params={"fields": "updated"}
             )
+        response.raise_for_status()
+        return response.json().get("fields", {}).get("updated")
+    
+    async def get_issues(self, issue_keys: List[str], use_cache: bool = True) -> List[JiraIssue]:
+        """Fetch several JIRA issues, in key order, with JQL searches instead of one request each.
+        
+        Issues still fresh in the cache are served from it; the rest are fetched in
+        batches of SEARCH_BATCH_SIZE keys, concurrently. Keys JIRA doesn't return are skipped.
+        """
+        # Keys are interpolated into JQL, so only well-formed ones may get that far
+        for key in issue_keys:
+            if not ISSUE_KEY_RE.match(key):
+                raise ValueError(f"Invalid issue key: {key!r}")
+        
+        issues: Dict[str, JiraIssue] = {}
+        missing = []
+        for key in dict.fromkeys(issue_keys):
+            cached = self._issue_cache.get(key) if use_cache else None
+            if cached and time.monotonic() - cached[0] < ISSUE_CACHE_TTL:
+                issues[key] = cached[2]
+            else:
+                missing.append(key)
+        
+        batches = [missing[i:i + SEARCH_BATCH_SIZE] for i in range(0, len(missing), SEARCH_BATCH_SIZE)]
+        for batch in await asyncio.gather(*(self._search_issues(keys) for keys in batches)):
+            for issue in batch:
+                issues[issue.key] = issue
+        
+        return [issues[key].model_copy(deep=True) for key in dict.fromkeys(issue_keys) if key in issues]
+    
+    async def _search_issues(self, issue_keys: List[str]) -> List[JiraIssue]:
+        """Run a "key in (...)" JQL search, following nextPageToken pagination, and cache the results."""
+        jql = "key in ({})".format(",".join(f'"{key}"' for key in issue_keys))
+        issues = []
+        next_page_token = None
+        while True:
+            params = {"jql": jql, "fields": f"{ISSUE_FIELDS},updated", "maxResults": SEARCH_BATCH_SIZE}
+            if next_page_token:
+                params["nextPageToken"] = next_page_token
+            async with _JIRA_SEM:
+                response = await self._client.get("/rest/api/3/search/jql", params=params)
+            if response.status_code == 400 and next_page_token is None:
+                # JQL rejects the whole search if any key doesn't exist; fall back to one request per key
+                return await self._get_existing_issues(issue_keys)
             response.raise_for_status()
             data = response.json()
             
-            return self._parse_issue(data)
+            for item in data.get("issues", []):
+                issue = self._parse_issue(item)
+                self._issue_cache[issue.key] = (time.monotonic(), (item.get("fields") or {}).get("updated"), issue)
+                issues.append(issue)
+            
+            next_page_token = data.get("nextPageToken")
+            if not next_page_token or data.get("isLast"):
+                return issues
+    
+    async def _get_existing_issues(self, issue_keys: List[str]) -> List[JiraIssue]:
+        """Fetch issues one by one, skipping keys that don't exist."""
+        results = await asyncio.gather(
+            *(self.get_issue(key, use_cache=False) for key in issue_keys),
+            return_exceptions=True
+        )
+        issues = []
+        for result in results:
+            if isinstance(result, httpx.HTTPStatusError) and result.response.status_code == 404:
+                continue
+            if isinstance(result, BaseException):
+                raise result
+            issues.append(result)
+        return issues
     
     def _parse_issue(self, data: Dict[str, Any]) -> JiraIssue:
         """Parse JIRA API response into JiraIssue model."""
-        fields = data.get("fields", {})
+        fields = data.get("fields") or {}
         
-        # Extract description
-        description = self._extract_text_from_adf(fields.get("description", {}))
+        # JIRA sends null for unset objects, so bind each one once with a {} fallback
+        issue_type = fields.get("issuetype") or {}
+        priority = fields.get("priority") or {}
+        status = fields.get("status") or {}
+        assignee = fields.get("assignee") or {}
         
-        # Extract acceptance criteria from description
-        acceptance_criteria = self._extract_acceptance_criteria(description)
+        # Extract description, and acceptance criteria if they sit under their own heading
+        description, acceptance_criteria = self._extract_description(fields.get("description"))
         
-        # Get assignee
-        assignee = None
-        if fields.get("assignee"):
-            assignee = fields["assignee"].get("displayName")
+        # Otherwise look for them in the description text
+        if acceptance_criteria is None:
+            acceptance_criteria = self._extract_acceptance_criteria(description)
         
         # Get attachments
-        attachments = []
-        for att in fields.get("attachment", []):
-            attachments.append({
+        attachments = [
+            {
                 "filename": att.get("filename"),
                 "mimeType": att.get("mimeType"),
                 "content": att.get("content")
-            })
+            }
+            for att in fields.get("attachment") or ()
+        ]
         
         return JiraIssue(
             key=data.get("key", ""),
             summary=fields.get("summary", ""),
             description=description,
-            issue_type=fields.get("issuetype", {}).get("name", ""),
-            priority=fields.get("priority", {}).get("name", "Medium"),
-            status=fields.get("status", {}).get("name", ""),
-            assignee=assignee,
-            labels=fields.get("labels", []),
-            components=[c.get("name", "") for c in fields.get("components", [])],
+            issue_type=issue_type.get("name", ""),
+            priority=priority.get("name", "Medium"),
+            status=status.get("name", ""),
+            assignee=assignee.get("displayName"),
+            labels=fields.get("labels") or [],
+            components=[c.get("name", "") for c in fields.get("components") or ()],
             acceptance_criteria=acceptance_criteria,
             attachments=attachments
         )
     
-    def _extract_text_from_adf(self, adf: Dict[str, Any]) -> str:
-        """Extract plain text from Atlassian Document Format."""
+    def _extract_description(self, adf: Union[Dict[str, Any], str, None]) -> Tuple[str, Optional[str]]:
+        """Extract plain text from Atlassian Document Format, plus its acceptance criteria section.
+        
+        Blocks following an "Acceptance Criteria" or "Scenario" heading are collected in the
+        same walk, one line per block, up to the next heading of the same or a higher level.
+        The second value is None when there is no such heading.
+        """
         if not adf:
-            return ""
+            return "", None
+        # Some projects (and the v2 API) return descriptions as plain text already
+        if isinstance(adf, str):
+            return adf, None
+        # An empty document has nothing to walk
+        if isinstance(adf, dict) and adf.get("type") != "text" and not adf.get("content"):
+            return "", None
         
-        texts = []
+        # Walk top-level blocks one at a time so a heading can claim the blocks after it
+        if isinstance(adf, dict) and adf.get("type") != "text" and isinstance(adf.get("content"), list):
+            blocks = adf["content"]
+        elif isinstance(adf, list):
+            blocks = adf
+        else:
+            blocks = [adf]
         
-        def traverse(node):
-            if isinstance(node, dict):
-                if node.get("type") == "text":
-                    texts.append(node.get("text", ""))
-                elif "content" in node:
-                    for child in node["content"]:
-                        traverse(child)
-            elif isinstance(node, list):
-                for item in node:
-                    traverse(item)
+        texts = []
+        ac_lines = []
+        # Level of the heading that opened the acceptance criteria section, if one is open
+        ac_level = None
+        for block in blocks:
+            block_texts = _adf_texts(block)
+            if isinstance(block, dict) and block.get("type") == "heading":
+                level = _heading_level(block)
+                if ac_level is not None and level > ac_level:
+                    # A sub-heading (e.g. "Scenario 1: ...") stays inside the section
+                    if block_texts:
+                        ac_lines.append(" ".join(block_texts))
+                elif _AC_HEADING_RE.fullmatch(" ".join(block_texts).strip()):
+                    ac_level = level
+                else:
+                    ac_level = None
+            elif ac_level is not None and block_texts:
+                ac_lines.append(" ".join(block_texts))
+            texts.extend(block_texts)
         
-        traverse(adf)
-        return " ".join(texts)
+        return " ".join(texts), "\n".join(ac_lines) or None
     
     def _extract_acceptance_criteria(self, description: str) -> Optional[str]:
         """Extract acceptance criteria from description."""
-        # Common patterns for acceptance criteria
-        patterns = [
-            r"(?:Acceptance Criteria|AC|Scenario):\s*(.+?)(?=\n\n|\Z)",
-            r"(?:Given|When|Then).*",
-        ]
-        
-        for pattern in patterns:
-            matches = re.findall(pattern, description, re.IGNORECASE | re.DOTALL)
-            if matches:
-                return "\n".join(matches)
+        sections = [match.group(1) for match in _AC_SECTION_RE.finditer(description)]
+        if sections:
+            return "\n".join(sections)
         
-        return None
+        # Stop scanning once enough steps are found, so a huge description can't dominate
+        steps = [match.group(0) for match in islice(_AC_STEP_RE.finditer(description), AC_MAX_STEPS)]
+        return "\n".join(steps) or None
 
 
 # Singleton instance
 _jira_client: Optional[JiraClient] = None
+# Replaced clients still open for requests that picked them up -> their pending close
+_retired_clients: Dict[JiraClient, "asyncio.Task"] = {}
+# Seconds a replaced client stays open; covers a revalidation plus a full fetch at the 30s timeout
+RETIRED_CLIENT_GRACE = 120
 
 
 def get_jira_client() -> Optional[JiraClient]:
@@ -125,6 +393,43 @@ def get_jira_client() -> Optional[JiraClient]:
 
 
 def set_jira_client(client: JiraClient):
-    """Set the JIRA client."""
+    """Set the JIRA client.
+    
+    The client it replaces is closed after RETIRED_CLIENT_GRACE seconds rather than
+    immediately, so requests that already hold it can finish.
+    """
     global _jira_client
+    previous = _jira_client
     _jira_client = client
+    if previous is not None and previous is not client and previous not in _retired_clients:
+        _retired_clients[previous] = asyncio.get_running_loop().create_task(_close_retired_client(previous))
+
+
+async def _close_retired_client(client: JiraClient):
+    """Close a replaced client once its grace period is over."""
+    await asyncio.sleep(RETIRED_CLIENT_GRACE)
+    _retired_clients.pop(client, None)
+    await client.close()
+
+
+async def close_jira_clients():
+    """Close the current client and any replaced ones still in their grace period."""
+    global _jira_client
+    clients = list(_retired_clients)
+    for task in _retired_clients.values():
+        task.cancel()
+    _retired_clients.clear()
+    if _jira_client is not None:
+        clients.append(_jira_client)
+        _jira_client = None
+    for client in clients:
+        await client.close()
+
+
+async def get_issue_cached(ticket_id: str, force_refresh: bool = False) -> JiraIssue:
+    """Fetch a JIRA issue through the configured client, serving recent fetches from its cache."""
+    client = get_jira_client()
+    if not client:
+        raise Exception("JIRA not configured")
+    
+    return await client.get_issue(ticket_id, use_cache=not force_refresh)
@@ -1,64 +1,70 @@
 """LLM provider services (Groq and Ollama)."""
 import httpx
-import json
+import orjson
 import asyncio
-from typing import AsyncGenerator, Optional, List, Dict, Any
-from groq import Groq
+import random
+import threading
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncGenerator, AsyncIterator, Awaitable, Callable, Optional, List, Dict, Any, TypeVar
+from groq import AsyncGroq
+from cachetools import LRUCache
 from models import (
     LLMProvider, LLMConfig, JiraIssue, TestPlan, ComprehensiveTestPlan,
     TestCase, RiskItem, TestSchedule, ResourceRequirement
 )
-from datetime import datetime
+from datetime import datetime, timezone
 
+T = TypeVar("T")
 
-class LLMProviderBase:
-    """Base class for LLM providers."""
-    
-    async def generate_test_plan(
-        self,
-        issue: JiraIssue,
-        template_content: Optional[str],
-        comprehensive: bool = True,
-        progress_callback: Optional[Any] = None
-    ) -> ComprehensiveTestPlan:
-        raise NotImplementedError
-    
-    async def test_connection(self) -> bool:
-        raise NotImplementedError
 
+# Retry policy for LLM calls: full-jitter exponential backoff, honouring Retry-After
+MAX_RETRIES = 3
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+RETRY_AFTER_MAX = 60.0
+NON_RETRYABLE_STATUS = {400, 401, 403, 404}
 
-class GroqProvider(LLMProviderBase):
-    """Groq API provider."""
-    
-    def __init__(self, api_key: str, model: str = "llama-3.3-70b-versatile", temperature: float = 0.7):
-        self.client = Groq(api_key=api_key)
-        self.model = model
-        self.temperature = temperature
-    
-    async def test_connection(self) -> bool:
-        """Test Groq API connection."""
+# Caps on concurrent generations per provider; a local Ollama usually has a single GPU.
+# Held per attempt, so a request waiting out a backoff doesn't occupy a slot.
+_GROQ_SEM = asyncio.Semaphore(8)
+_OLLAMA_SEM = asyncio.Semaphore(2)
+
+
+def _retry_after_seconds(response: Optional[httpx.Response]) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP date), if present."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+async def _retry(coro_fn: Callable[[], Awaitable[T]], max_retries: int = MAX_RETRIES) -> T:
+    """Await coro_fn(), retrying failures with backoff; client errors fail fast."""
+    for attempt in range(max_retries):
         try:
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[{"role": "user", "content": "Hi"}],
-                max_tokens=5
-            )
-            return True
+            return await coro_fn()
         except Exception as e:
-            print(f"Groq connection test failed: {e}")
-            return False
-    
-    async def generate_test_plan(
-        self,
-        issue: JiraIssue,
-        template_content: Optional[str],
-        comprehensive: bool = True,
-        progress_callback: Optional[Any] = None
-    ) -> ComprehensiveTestPlan:
-        """Generate comprehensive test plan using Groq."""
-        
-        # Build the comprehensive prompt
-        system_prompt = """You are an expert QA Engineer with years of experience in software testing. 
+            # httpx.HTTPStatusError and groq.APIStatusError both carry the response
+            response = getattr(e, "response", None)
+            status = getattr(response, "status_code", None)
+            if status in NON_RETRYABLE_STATUS or attempt == max_retries - 1:
+                raise
+            delay = _retry_after_seconds(response)
+            if delay is None:
+                delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+            await asyncio.sleep(min(delay, RETRY_AFTER_MAX))
+
+
+# System prompts are fixed, so they are built once at import time
+_GROQ_SYSTEM_PROMPT = """You are an expert QA Engineer with years of experience in software testing. 
 Generate a comprehensive, professional test plan document based on the provided JIRA ticket.
 
 Your response must be valid JSON with the following comprehensive structure:
@@ -119,34 +125,117 @@ Guidelines:
 5. Schedule should reflect realistic testing phases
 6. Resources should include both human and tool requirements"""
 
+_OLLAMA_SYSTEM_PROMPT = """You are an expert QA Engineer. Generate a comprehensive test plan based on the provided JIRA ticket.
+Your response must be valid JSON with the following structure:
+
+{
+  "title": "Test Plan: ...",
+  "executive_summary": "Brief overview",
+  "scope_objectives": "Scope and objectives",
+  "test_strategy": "Testing approach",
+  "test_environment": "Environment requirements",
+  "entry_criteria": ["Condition 1"],
+  "exit_criteria": ["Condition 1"],
+  "risks_mitigations": [{"description": "...", "impact": "High", "mitigation": "..."}],
+  "test_schedule": [{"phase": "...", "duration": "...", "activities": ["..."]}],
+  "resource_requirements": [{"type": "...", "description": "...", "quantity": "..."}],
+  "test_cases": [{"id": "TC-001", "title": "...", "description": "...", "preconditions": [], "steps": [], "expected_results": [], "priority": "High", "test_type": "Functional"}]
+}"""
+
+
+class LLMProviderBase:
+    """Base class for LLM providers."""
+    
+    async def generate_test_plan(
+        self,
+        issue: JiraIssue,
+        template_content: Optional[str],
+        comprehensive: bool = True,
+        progress_callback: Optional[Any] = None
+    ) -> ComprehensiveTestPlan:
+        raise NotImplementedError
+    
+    async def test_connection(self) -> bool:
+        raise NotImplementedError
+    
+    async def close(self):
+        """Release any connections held by the provider."""
+    
+    async def __aenter__(self) -> "LLMProviderBase":
+        return self
+    
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+
+class GroqProvider(LLMProviderBase):
+    """Groq API provider."""
+    
+    def __init__(self, api_key: str, model: str = "llama-3.3-70b-versatile", temperature: float = 0.7):
+        # Async client so LLM round-trips don't block the event loop; HTTP/2 lets
+        # concurrent generations share one TLS connection. Timeouts match the SDK defaults.
+        self.client = AsyncGroq(
+            api_key=api_key,
+            max_retries=0,  # _retry() owns retries
+            http_client=httpx.AsyncClient(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+                timeout=httpx.Timeout(60.0, connect=5.0)
+            )
+        )
+        self.model = model
+        self.temperature = temperature
+    
+    async def close(self):
+        """Close the underlying HTTP connection pool."""
+        await self.client.close()
+    
+    async def test_connection(self) -> bool:
+        """Test Groq API connection."""
+        try:
+            response = await self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": "Hi"}],
+                max_tokens=5
+            )
+            return True
+        except Exception as e:
+            print(f"Groq connection test failed: {e}")
+            return False
+    
+    async def generate_test_plan(
+        self,
+        issue: JiraIssue,
+        template_content: Optional[str],
+        comprehensive: bool = True,
+        progress_callback: Optional[Any] = None
+    ) -> ComprehensiveTestPlan:
+        """Generate comprehensive test plan using Groq."""
+        
         # Build context
-        context = f"""
-JIRA Ticket Details:
-===================
-Ticket Key: {issue.key}
-Summary: {issue.summary}
-Description: {issue.description}
-Priority: {issue.priority}
-Issue Type: {issue.issue_type}
-Status: {issue.status}
-Labels: {', '.join(issue.labels) if issue.labels else 'None'}
-Components: {', '.join(issue.components) if issue.components else 'None'}
-Assignee: {issue.assignee or 'Unassigned'}
-"""
+        parts = [
+            "",
+            "JIRA Ticket Details:",
+            "===================",
+            f"Ticket Key: {issue.key}",
+            f"Summary: {issue.summary}",
+            f"Description: {issue.description}",
+            f"Priority: {issue.priority}",
+            f"Issue Type: {issue.issue_type}",
+            f"Status: {issue.status}",
+            f"Labels: {', '.join(issue.labels) if issue.labels else 'None'}",
+            f"Components: {', '.join(issue.components) if issue.components else 'None'}",
+            f"Assignee: {issue.assignee or 'Unassigned'}",
+        ]
         
         if issue.acceptance_criteria:
-            context += f"""
-Acceptance Criteria:
-===================
-{issue.acceptance_criteria}
-"""
+            parts += ["", "Acceptance Criteria:", "===================", issue.acceptance_criteria]
         
         if template_content:
-            context += f"""
-Template Structure:
-===================
-{template_content}
-"""
+            parts += ["", "Template Structure:", "===================", template_content]
+        
+        parts.append("")
+        context = "\n".join(parts)
         
         user_prompt = f"""{context}
 
@@ -166,90 +255,89 @@ The test plan should include:
 Generate a professional test plan that could be used in an enterprise environment."""
         
         # Call Groq API
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                response = self.client.chat.completions.create(
+        async def request_plan() -> ComprehensiveTestPlan:
+            async with _GROQ_SEM:
+                response = await self.client.chat.completions.create(
                     model=self.model,
                     messages=[
-                        {"role": "system", "content": system_prompt},
+                        {"role": "system", "content": _GROQ_SYSTEM_PROMPT},
                         {"role": "user", "content": user_prompt}
                     ],
                     temperature=self.temperature,
                     max_tokens=8000,
                     response_format={"type": "json_object"}
                 )
-                
-                content = response.choices[0].message.content
-                data = json.loads(content)
-                
-                # Parse test cases
-                test_cases = []
-                for i, tc in enumerate(data.get("test_cases", [])):
-                    test_cases.append(TestCase(
-                        id=tc.get("id", f"TC-{i+1:03d}"),
-                        title=tc.get("title", ""),
-                        description=tc.get("description", ""),
-                        preconditions=tc.get("preconditions", []),
-                        steps=tc.get("steps", []),
-                        expected_results=tc.get("expected_results", []),
-                        priority=tc.get("priority", "Medium"),
-                        test_type=tc.get("test_type", "Functional")
-                    ))
-                
-                # Parse risks
-                risks = []
-                for risk in data.get("risks_mitigations", []):
-                    risks.append(RiskItem(
-                        description=risk.get("description", ""),
-                        impact=risk.get("impact", "Medium"),
-                        mitigation=risk.get("mitigation", "")
-                    ))
-                
-                # Parse schedule
-                schedule = []
-                for phase in data.get("test_schedule", []):
-                    schedule.append(TestSchedule(
-                        phase=phase.get("phase", ""),
-                        duration=phase.get("duration", ""),
-                        activities=phase.get("activities", [])
-                    ))
-                
-                # Parse resources
-                resources = []
-                for resource in data.get("resource_requirements", []):
-                    resources.append(ResourceRequirement(
-                        type=resource.get("type", ""),
-                        description=resource.get("description", ""),
-                        quantity=resource.get("quantity")
-                    ))
-                
-                return ComprehensiveTestPlan(
-                    title=data.get("title", f"Test Plan: {issue.summary}"),
-                    source_issue=issue.key,
-                    generated_at=datetime.utcnow(),
-                    executive_summary=data.get("executive_summary", ""),
-                    scope_objectives=data.get("scope_objectives", ""),
-                    test_strategy=data.get("test_strategy", ""),
-                    test_environment=data.get("test_environment", ""),
-                    entry_criteria=data.get("entry_criteria", []),
-                    exit_criteria=data.get("exit_criteria", []),
-                    risks_mitigations=risks,
-                    test_schedule=schedule,
-                    resource_requirements=resources,
-                    test_cases=test_cases,
-                    metadata={
-                        "provider": "groq",
-                        "model": self.model,
-                        "total_tests": len(test_cases),
-                        "comprehensive": True
-                    }
-                )
-                
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise Exception(f"Failed to generate test plan after {max_retries} attempts: {e}")
-                await asyncio.sleep(2 ** attempt)
+            
+            content = response.choices[0].message.content
+            data = orjson.loads(content)
+            
+            # Parse test cases
+            test_cases = []
+            for i, tc in enumerate(data.get("test_cases", [])):
+                test_cases.append(TestCase(
+                    id=tc.get("id", f"TC-{i+1:03d}"),
+                    title=tc.get("title", ""),
+                    description=tc.get("description", ""),
+                    preconditions=tc.get("preconditions", []),
+                    steps=tc.get("steps", []),
+                    expected_results=tc.get("expected_results", []),
+                    priority=tc.get("priority", "Medium"),
+                    test_type=tc.get("test_type", "Functional")
+                ))
+            
+            # Parse risks
+            risks = []
+            for risk in data.get("risks_mitigations", []):
+                risks.append(RiskItem(
+                    description=risk.get("description", ""),
+                    impact=risk.get("impact", "Medium"),
+                    mitigation=risk.get("mitigation", "")
+                ))
+            
+            # Parse schedule
+            schedule = []
+            for phase in data.get("test_schedule", []):
+                schedule.append(TestSchedule(
+                    phase=phase.get("phase", ""),
+                    duration=phase.get("duration", ""),
+                    activities=phase.get("activities", [])
+                ))
+            
+            # Parse resources
+            resources = []
+            for resource in data.get("resource_requirements", []):
+                resources.append(ResourceRequirement(
+                    type=resource.get("type", ""),
+                    description=resource.get("description", ""),
+                    quantity=resource.get("quantity")
+                ))
+            
+            return ComprehensiveTestPlan(
+                title=data.get("title", f"Test Plan: {issue.summary}"),
+                source_issue=issue.key,
+                generated_at=datetime.utcnow(),
+                executive_summary=data.get("executive_summary", ""),
+                scope_objectives=data.get("scope_objectives", ""),
+                test_strategy=data.get("test_strategy", ""),
+                test_environment=data.get("test_environment", ""),
+                entry_criteria=data.get("entry_criteria", []),
+                exit_criteria=data.get("exit_criteria", []),
+                risks_mitigations=risks,
+                test_schedule=schedule,
+                resource_requirements=resources,
+                test_cases=test_cases,
+                metadata={
+                    "provider": "groq",
+                    "model": self.model,
+                    "total_tests": len(test_cases),
+                    "comprehensive": True
+                }
+            )
+
+        try:
+            return await _retry(request_plan)
+        except Exception as e:
+            raise Exception(f"Failed to generate test plan: {e}")
 
 
 class OllamaProvider(LLMProviderBase):
@@ -258,24 +346,32 @@ class OllamaProvider(LLMProviderBase):
     def __init__(self, base_url: str = "http://localhost:11434", model: Optional[str] = None):
         self.base_url = base_url.rstrip("/")
         self.model = model
+        # Generation can take minutes, but an unreachable server should fail fast
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+            timeout=httpx.Timeout(120.0, connect=5.0)
+        )
+    
+    async def close(self):
+        """Close the underlying HTTP connection pool."""
+        await self._client.aclose()
     
     async def test_connection(self) -> bool:
         """Test Ollama connection."""
         try:
-            async with httpx.AsyncClient() as client:
-                response = await client.get(f"{self.base_url}/api/tags")
-                return response.status_code == 200
+            response = await self._client.get("/api/tags")
+            return response.status_code == 200
         except Exception as e:
             print(f"Ollama connection test failed: {e}")
             return False
     
     async def list_models(self) -> List[str]:
         """List available Ollama models."""
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"{self.base_url}/api/tags")
-            response.raise_for_status()
-            data = response.json()
-            return [model["name"] for model in data.get("models", [])]
+        response = await self._client.get("/api/tags")
+        response.raise_for_status()
+        data = orjson.loads(response.content)
+        return [model["name"] for model in data.get("models", [])]
     
     async def generate_test_plan(
         self,
@@ -292,168 +388,242 @@ class OllamaProvider(LLMProviderBase):
                 raise Exception("No Ollama models available")
             self.model = models[0]
         
-        # Build the prompt
-        system_prompt = """You are an expert QA Engineer. Generate a comprehensive test plan based on the provided JIRA ticket.
-Your response must be valid JSON with the following structure:
-
-{
-  "title": "Test Plan: ...",
-  "executive_summary": "Brief overview",
-  "scope_objectives": "Scope and objectives",
-  "test_strategy": "Testing approach",
-  "test_environment": "Environment requirements",
-  "entry_criteria": ["Condition 1"],
-  "exit_criteria": ["Condition 1"],
-  "risks_mitigations": [{"description": "...", "impact": "High", "mitigation": "..."}],
-  "test_schedule": [{"phase": "...", "duration": "...", "activities": ["..."]}],
-  "resource_requirements": [{"type": "...", "description": "...", "quantity": "..."}],
-  "test_cases": [{"id": "TC-001", "title": "...", "description": "...", "preconditions": [], "steps": [], "expected_results": [], "priority": "High", "test_type": "Functional"}]
-}"""
-
         # Build context
-        context = f"""
-JIRA Ticket:
-- Key: {issue.key}
-- Summary: {issue.summary}
-- Description: {issue.description}
-- Priority: {issue.priority}
-- Issue Type: {issue.issue_type}
-"""
+        parts = [
+            "",
+            "JIRA Ticket:",
+            f"- Key: {issue.key}",
+            f"- Summary: {issue.summary}",
+            f"- Description: {issue.description}",
+            f"- Priority: {issue.priority}",
+            f"- Issue Type: {issue.issue_type}",
+        ]
         
         if issue.acceptance_criteria:
-            context += f"\nAcceptance Criteria:\n{issue.acceptance_criteria}\n"
+            parts += ["", "Acceptance Criteria:", issue.acceptance_criteria]
         
         if template_content:
-            context += f"\nTemplate Structure:\n{template_content}\n"
+            parts += ["", "Template Structure:", template_content]
+        
+        parts.append("")
+        context = "\n".join(parts)
         
         user_prompt = f"{context}\n\nGenerate a comprehensive test plan with all sections and 8-15 detailed test cases."
         
         # Call Ollama API
-        max_retries = 3
-        for attempt in range(max_retries):
-            try:
-                async with httpx.AsyncClient(timeout=120.0) as client:
-                    response = await client.post(
-                        f"{self.base_url}/api/generate",
-                        json={
-                            "model": self.model,
-                            "prompt": f"{system_prompt}\n\n{user_prompt}",
-                            "stream": False,
-                            "format": "json"
-                        }
-                    )
+        async def request_plan() -> ComprehensiveTestPlan:
+            # Stream tokens as they are generated instead of waiting for the whole body
+            parts = []
+            async with _OLLAMA_SEM:
+                async with self._client.stream(
+                    "POST",
+                    "/api/generate",
+                    json={
+                        "model": self.model,
+                        "prompt": f"{_OLLAMA_SYSTEM_PROMPT}\n\n{user_prompt}",
+                        "stream": True,
+                        "format": "json"
+                    }
+                ) as response:
                     response.raise_for_status()
-                    data = response.json()
-                    
-                    content = data.get("response", "")
-                    
-                    # Try to extract JSON
-                    try:
-                        start = content.find("{")
-                        end = content.rfind("}") + 1
-                        if start != -1 and end != 0:
-                            json_str = content[start:end]
-                            result = json.loads(json_str)
-                        else:
-                            result = json.loads(content)
-                    except json.JSONDecodeError:
-                        # Fallback structure
-                        result = {
-                            "title": f"Test Plan: {issue.summary}",
-                            "executive_summary": f"Test plan for {issue.key}",
-                            "scope_objectives": "Test the feature as described",
-                            "test_strategy": "Manual and automated testing",
-                            "test_environment": "Standard test environment",
-                            "entry_criteria": ["Code is deployed", "Test data is prepared"],
-                            "exit_criteria": ["All tests pass", "No critical defects"],
-                            "risks_mitigations": [{"description": "Delays", "impact": "Medium", "mitigation": "Buffer time"}],
-                            "test_schedule": [{"phase": "Execution", "duration": "1 week", "activities": ["Run tests"]}],
-                            "resource_requirements": [{"type": "Human", "description": "QA Engineer", "quantity": "1"}],
-                            "test_cases": [
-                                {
-                                    "id": "TC-001",
-                                    "title": f"Verify {issue.summary}",
-                                    "description": content[:500],
-                                    "preconditions": [],
-                                    "steps": ["Execute test"],
-                                    "expected_results": ["Feature works as expected"],
-                                    "priority": "High",
-                                    "test_type": "Functional"
-                                }
-                            ]
-                        }
-                    
-                    # Parse test cases
-                    test_cases = []
-                    for i, tc in enumerate(result.get("test_cases", [])):
-                        test_cases.append(TestCase(
-                            id=tc.get("id", f"TC-{i+1:03d}"),
-                            title=tc.get("title", ""),
-                            description=tc.get("description", ""),
-                            preconditions=tc.get("preconditions", []),
-                            steps=tc.get("steps", []),
-                            expected_results=tc.get("expected_results", []),
-                            priority=tc.get("priority", "Medium"),
-                            test_type=tc.get("test_type", "Functional")
-                        ))
-                    
-                    # Parse risks
-                    risks = []
-                    for risk in result.get("risks_mitigations", []):
-                        risks.append(RiskItem(
-                            description=risk.get("description", ""),
-                            impact=risk.get("impact", "Medium"),
-                            mitigation=risk.get("mitigation", "")
-                        ))
-                    
-                    # Parse schedule
-                    schedule = []
-                    for phase in result.get("test_schedule", []):
-                        schedule.append(TestSchedule(
-                            phase=phase.get("phase", ""),
-                            duration=phase.get("duration", ""),
-                            activities=phase.get("activities", [])
-                        ))
-                    
-                    # Parse resources
-                    resources = []
-                    for resource in result.get("resource_requirements", []):
-                        resources.append(ResourceRequirement(
-                            type=resource.get("type", ""),
-                            description=resource.get("description", ""),
-                            quantity=resource.get("quantity")
-                        ))
-                    
-                    return ComprehensiveTestPlan(
-                        title=result.get("title", f"Test Plan: {issue.summary}"),
-                        source_issue=issue.key,
-                        generated_at=datetime.utcnow(),
-                        executive_summary=result.get("executive_summary", ""),
-                        scope_objectives=result.get("scope_objectives", ""),
-                        test_strategy=result.get("test_strategy", ""),
-                        test_environment=result.get("test_environment", ""),
-                        entry_criteria=result.get("entry_criteria", []),
-                        exit_criteria=result.get("exit_criteria", []),
-                        risks_mitigations=risks,
-                        test_schedule=schedule,
-                        resource_requirements=resources,
-                        test_cases=test_cases,
-                        metadata={
-                            "provider": "ollama",
-                            "model": self.model,
-                            "total_tests": len(test_cases),
-                            "comprehensive": True
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        chunk = orjson.loads(line)
+                        if chunk.get("error"):
+                            raise Exception(chunk["error"])
+                        parts.append(chunk.get("response", ""))
+                        if progress_callback:
+                            await progress_callback(len(parts))
+                        if chunk.get("done"):
+                            break
+            
+            content = "".join(parts)
+            
+            # Try to extract JSON
+            try:
+                start = content.find("{")
+                end = content.rfind("}") + 1
+                if start != -1 and end != 0:
+                    json_str = content[start:end]
+                    result = orjson.loads(json_str)
+                else:
+                    result = orjson.loads(content)
+            except orjson.JSONDecodeError:
+                # Fallback structure
+                result = {
+                    "title": f"Test Plan: {issue.summary}",
+                    "executive_summary": f"Test plan for {issue.key}",
+                    "scope_objectives": "Test the feature as described",
+                    "test_strategy": "Manual and automated testing",
+                    "test_environment": "Standard test environment",
+                    "entry_criteria": ["Code is deployed", "Test data is prepared"],
+                    "exit_criteria": ["All tests pass", "No critical defects"],
+                    "risks_mitigations": [{"description": "Delays", "impact": "Medium", "mitigation": "Buffer time"}],
+                    "test_schedule": [{"phase": "Execution", "duration": "1 week", "activities": ["Run tests"]}],
+                    "resource_requirements": [{"type": "Human", "description": "QA Engineer", "quantity": "1"}],
+                    "test_cases": [
+                        {
+                            "id": "TC-001",
+                            "title": f"Verify {issue.summary}",
+                            "description": content[:500],
+                            "preconditions": [],
+                            "steps": ["Execute test"],
+                            "expected_results": ["Feature works as expected"],
+                            "priority": "High",
+                            "test_type": "Functional"
                         }
-                    )
-                    
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise Exception(f"Failed to generate test plan after {max_retries} attempts: {e}")
-                await asyncio.sleep(2 ** attempt)
+                    ]
+                }
+            
+            # Parse test cases
+            test_cases = []
+            for i, tc in enumerate(result.get("test_cases", [])):
+                test_cases.append(TestCase(
+                    id=tc.get("id", f"TC-{i+1:03d}"),
+                    title=tc.get("title", ""),
+                    description=tc.get("description", ""),
+                    preconditions=tc.get("preconditions", []),
+                    steps=tc.get("steps", []),
+                    expected_results=tc.get("expected_results", []),
+                    priority=tc.get("priority", "Medium"),
+                    test_type=tc.get("test_type", "Functional")
+                ))
+            
+            # Parse risks
+            risks = []
+            for risk in result.get("risks_mitigations", []):
+                risks.append(RiskItem(
+                    description=risk.get("description", ""),
+                    impact=risk.get("impact", "Medium"),
+                    mitigation=risk.get("mitigation", "")
+                ))
+            
+            # Parse schedule
+            schedule = []
+            for phase in result.get("test_schedule", []):
+                schedule.append(TestSchedule(
+                    phase=phase.get("phase", ""),
+                    duration=phase.get("duration", ""),
+                    activities=phase.get("activities", [])
+                ))
+            
+            # Parse resources
+            resources = []
+            for resource in result.get("resource_requirements", []):
+                resources.append(ResourceRequirement(
+                    type=resource.get("type", ""),
+                    description=resource.get("description", ""),
+                    quantity=resource.get("quantity")
+                ))
+            
+            return ComprehensiveTestPlan(
+                title=result.get("title", f"Test Plan: {issue.summary}"),
+                source_issue=issue.key,
+                generated_at=datetime.utcnow(),
+                executive_summary=result.get("executive_summary", ""),
+                scope_objectives=result.get("scope_objectives", ""),
+                test_strategy=result.get("test_strategy", ""),
+                test_environment=result.get("test_environment", ""),
+                entry_criteria=result.get("entry_criteria", []),
+                exit_criteria=result.get("exit_criteria", []),
+                risks_mitigations=risks,
+                test_schedule=schedule,
+                resource_requirements=resources,
+                test_cases=test_cases,
+                metadata={
+                    "provider": "ollama",
+                    "model": self.model,
+                    "total_tests": len(test_cases),
+                    "comprehensive": True
+                }
+            )
+
+        try:
+            return await _retry(request_plan)
+        except Exception as e:
+            raise Exception(f"Failed to generate test plan: {e}")
+
+
+class _ProviderCache(LRUCache):
+    """LRU of shared providers that hands evicted entries to _retire_provider()."""
+    
+    def popitem(self):
+        key, provider = super().popitem()
+        _retire_provider(provider)
+        return key, provider
+
+
+# Providers keyed by their config, so HTTP pools are shared across requests.
+# Bounded; an evicted provider is closed once the requests using it have finished.
+_provider_cache: LRUCache = _ProviderCache(maxsize=8)
+_provider_cache_lock = threading.Lock()
+# Provider -> number of get_llm_provider() blocks currently using it
+_provider_users: Dict[LLMProviderBase, int] = {}
+# Evicted providers waiting to be closed, both idle and still in use
+_retired_providers: set = set()
+
 
+def _retire_provider(provider: LLMProviderBase):
+    """Mark an evicted provider for closing; called with _provider_cache_lock held."""
+    _retired_providers.add(provider)
 
-def get_llm_provider(config: LLMConfig) -> LLMProviderBase:
-    """Factory function to get the appropriate LLM provider."""
+
+def _take_idle_retired() -> List[LLMProviderBase]:
+    """Pop retired providers nobody is using; called with _provider_cache_lock held."""
+    idle = [p for p in _retired_providers if not _provider_users.get(p)]
+    _retired_providers.difference_update(idle)
+    return idle
+
+
+@asynccontextmanager
+async def get_llm_provider(config: LLMConfig) -> AsyncIterator[LLMProviderBase]:
+    """Use the shared LLM provider for a config for the duration of an `async with` block.
+    
+    The provider is created on first use and kept for later requests; one evicted
+    from the cache is closed when the last block using it exits.
+    """
+    key = (
+        config.provider, config.groq_api_key, config.groq_model,
+        config.ollama_base_url, config.ollama_model, round(config.temperature, 3)
+    )
+    with _provider_cache_lock:
+        provider = _provider_cache.get(key)
+        if provider is None:
+            provider = create_llm_provider(config)
+            _provider_cache[key] = provider
+        _provider_users[provider] = _provider_users.get(provider, 0) + 1
+        idle = _take_idle_retired()
+    for retired in idle:
+        await retired.close()
+    
+    try:
+        yield provider
+    finally:
+        with _provider_cache_lock:
+            _provider_users[provider] -= 1
+            if not _provider_users[provider]:
+                del _provider_users[provider]
+            idle = _take_idle_retired()
+        for retired in idle:
+            await retired.close()
+
+
+async def close_llm_providers():
+    """Close and forget all cached and retired providers."""
+    with _provider_cache_lock:
+        providers = list(_provider_cache.values()) + list(_retired_providers)
+        _provider_cache.clear()
+        _retired_providers.clear()
+    for provider in providers:
+        await provider.close()
+
+
+def create_llm_provider(config: LLMConfig) -> LLMProviderBase:
+    """Factory function to get the appropriate LLM provider.
+    
+    Returns a new, unshared provider; the caller is responsible for closing it.
+    """
     if config.provider == LLMProvider.GROQ:
         return GroqProvider(
             api_key=config.groq_api_key or "",
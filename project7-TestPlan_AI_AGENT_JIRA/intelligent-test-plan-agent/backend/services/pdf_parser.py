@@ -1,7 +1,59 @@
 """PDF parsing service for test plan templates."""
 from pypdf import PdfReader
-from io import BytesIO
-from typing import Optional
+from io import BytesIO, StringIO
+from typing import Iterator, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+import os
+
+try:
+    # MuPDF extracts text in C, far faster than pypdf; fall back when it isn't installed
+    import pymupdf
+except ImportError:
+    pymupdf = None
+
+# Below this page count, extraction is cheaper than shipping the PDF to worker processes
+PARALLEL_PAGE_THRESHOLD = 4
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+# Lines matching one of these (case-insensitively) start a new template section
+_HEADER_WORDS = frozenset({
+    "test plan", "test cases", "preconditions",
+    "test steps", "expected results", "test scenario"
+})
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Get or lazily create the shared pool for page extraction."""
+    global _executor
+    if _executor is None:
+        # spawn, not fork: the server process has threads running when this is first called
+        _executor = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+
+def _discard_executor(executor: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next large PDF gets a fresh one."""
+    global _executor
+    if _executor is executor:
+        _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_pdf_executor() -> None:
+    """Stop the page extraction pool's worker processes, if one was started."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True, cancel_futures=True)
+        _executor = None
+
+
+def _extract_page_range(file_content: bytes, start: int, stop: int) -> List[str]:
+    """Extract text from pages [start, stop) of a PDF; runs in a worker process."""
+    reader = PdfReader(BytesIO(file_content))
+    return [reader.pages[i].extract_text() for i in range(start, stop)]
 
 
 class PDFParser:
@@ -11,42 +63,76 @@ class PDFParser:
     def parse_pdf(file_content: bytes) -> str:
         """Extract text from PDF bytes."""
         try:
-            pdf_file = BytesIO(file_content)
-            reader = PdfReader(pdf_file)
+            if pymupdf is not None:
+                page_texts = PDFParser._iter_with_pymupdf(file_content)
+            else:
+                page_texts = PDFParser._iter_with_pypdf(file_content)
             
-            text_parts = []
-            for page in reader.pages:
-                text = page.extract_text()
+            # Write pages out as they are extracted rather than holding a list of them to join
+            buffer = StringIO()
+            for text in page_texts:
                 if text:
-                    text_parts.append(text)
-            
-            return "\n\n".join(text_parts)
+                    if buffer.tell():
+                        buffer.write("\n\n")
+                    buffer.write(text)
+            return buffer.getvalue()
         except Exception as e:
             raise Exception(f"Failed to parse PDF: {e}")
     
+    @staticmethod
+    def _iter_with_pymupdf(file_content: bytes) -> Iterator[str]:
+        """Yield per-page text with MuPDF."""
+        with pymupdf.open(stream=file_content, filetype="pdf") as doc:
+            for page in doc:
+                yield page.get_text("text")
+    
+    @staticmethod
+    def _iter_with_pypdf(file_content: bytes) -> Iterator[str]:
+        """Yield per-page text with pypdf, spreading large PDFs across processes."""
+        pdf_file = BytesIO(file_content)
+        reader = PdfReader(pdf_file)
+        
+        page_count = len(reader.pages)
+        
+        if page_count < PARALLEL_PAGE_THRESHOLD:
+            for page in reader.pages:
+                yield page.extract_text()
+            return
+        
+        # Text extraction is pure-Python and CPU-bound, so split pages across processes
+        workers = min(os.cpu_count() or 1, page_count)
+        step = -(-page_count // workers)
+        executor = _get_executor()
+        done = 0
+        try:
+            futures = [
+                executor.submit(_extract_page_range, file_content, start, min(start + step, page_count))
+                for start in range(0, page_count, step)
+            ]
+            for future in futures:
+                texts = future.result()
+                yield from texts
+                done += len(texts)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); replace the pool next time and finish this PDF inline
+            _discard_executor(executor)
+            for i in range(done, page_count):
+                yield reader.pages[i].extract_text()
+    
     @staticmethod
     def extract_structure(text: str) -> str:
         """Extract structure/template from PDF text."""
-        lines = text.split("\n")
-        
         # Look for common section headers
         sections = []
         current_section = []
         
-        for line in lines:
+        for line in text.splitlines():
             line = line.strip()
             if not line:
                 continue
             
             # Check if line looks like a header
-            is_header = (
-                line.isupper() or
-                line.endswith(":") or
-                line.lower() in [
-                    "test plan", "test cases", "preconditions", 
-                    "test steps", "expected results", "test scenario"
-                ]
-            )
+            is_header = line.isupper() or line.endswith(":") or line.lower() in _HEADER_WORDS
             
             if is_header:
                 if current_section:
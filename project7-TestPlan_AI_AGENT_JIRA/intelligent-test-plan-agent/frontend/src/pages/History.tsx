@@ -42,6 +42,8 @@ export default function HistoryPage() {
   const [history, setHistory] = useState<HistoryItem[]>([])
   const [selectedItem, setSelectedItem] = useState<TestPlanDetail | null>(null)
   const [loading, setLoading] = useState(false)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [detailLoading, setDetailLoading] = useState(false)
 
   useEffect(() => {
@@ -53,6 +55,7 @@ export default function HistoryPage() {
     try {
       const response = await testPlanApi.getHistory()
       setHistory(response.data.history || [])
+      setNextCursor(response.data.next_cursor || null)
     } catch (err) {
       console.error('Failed to load history', err)
     } finally {
@@ -60,6 +63,20 @@ export default function HistoryPage() {
     }
   }
 
+  const loadMoreHistory = async () => {
+    if (!nextCursor) return
+    setLoadingMore(true)
+    try {
+      const response = await testPlanApi.getHistory({ before: nextCursor })
+      setHistory((prev) => [...prev, ...(response.data.history || [])])
+      setNextCursor(response.data.next_cursor || null)
+    } catch (err) {
+      console.error('Failed to load more history', err)
+    } finally {
+      setLoadingMore(false)
+    }
+  }
+
   const loadDetail = async (id: string) => {
     setDetailLoading(true)
     try {
@@ -176,6 +193,16 @@ export default function HistoryPage() {
                     </p>
                   </button>
                 ))}
+                {nextCursor && (
+                  <button
+                    onClick={loadMoreHistory}
+                    disabled={loadingMore}
+                    className="w-full p-3 text-sm font-medium text-primary-600 hover:bg-gray-50 disabled:opacity-50 flex items-center justify-center gap-2"
+                  >
+                    {loadingMore && <Loader2 className="animate-spin" size={16} />}
+                    {loadingMore ? 'Loading...' : 'Load more'}
+                  </button>
+                )}
               </div>
             )}
           </div>
@@ -71,8 +71,8 @@ export const testPlanApi = {
     provider: string
   }) => api.post('/testplan/generate', data),
   
-  getHistory: () =>
-    api.get('/testplan/history'),
+  getHistory: (params?: { limit?: number; before?: string }) =>
+    api.get('/testplan/history', { params }),
   
   getHistoryItem: (id: string) =>
     api.get(`/testplan/history/${id}`),